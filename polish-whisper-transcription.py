@@ -1,55 +1,356 @@
 # Transkrypcja i analiza nagrań audio w języku polskim
-# Używa modelu Whisper i biblioteki librosa (bez potrzeby instalacji FFmpeg)
+# Używa modelu Whisper (faster-whisper / CTranslate2) i biblioteki soundfile (bez potrzeby instalacji FFmpeg)
 
 import os
+import glob
+import math
+import functools
+import gc
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import whisper
-import json
+import torch
+import ctranslate2
+import torchaudio
+import soundfile as sf
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+import orjson
+from contextlib import nullcontext
+import matplotlib
 import matplotlib.pyplot as plt
 from IPython.display import Audio, display
 import re
 import pandas as pd
-from datetime import timedelta
-import librosa
+from tqdm.auto import tqdm
 import warnings
 
+# OpenVINO GenAI jest opcjonalny - używany tylko na komputerach bez CUDA
+try:
+    from openvino_genai import WhisperPipeline
+except ImportError:
+    WhisperPipeline = None
+
 # Ignoruj ostrzeżenia
 warnings.filterwarnings("ignore")
 
 # 1. Załadowanie modelu Whisper
 # ----------------------------
+def detect_device(compute_type=None):
+    """
+    Wybiera urządzenie i typ obliczeń dla modelu CTranslate2
+    
+    FP16 jest wybierane tylko na kartach z Tensor Cores (Volta i nowsze), gdzie
+    daje kilkukrotnie większą przepustowość niż FP32. Starsze karty i CPU
+    korzystają z int8 z akumulacją w FP32.
+    
+    Args:
+        compute_type (str): Wymuszony typ obliczeń (np. "float16") lub None dla wyboru automatycznego
+    
+    Returns:
+        tuple: (urządzenie, typ obliczeń), np. ("cuda", "int8_float16")
+    """
+    if not torch.cuda.is_available():
+        return "cpu", compute_type or "int8"
+    
+    if compute_type is not None:
+        return "cuda", compute_type
+    
+    if torch.cuda.get_device_capability()[0] >= 7:
+        preferred = ["int8_float16", "float16", "int8_float32", "float32"]
+    else:
+        preferred = ["int8_float32", "float32"]
+    
+    supported = ctranslate2.get_supported_compute_types("cuda")
+    for candidate in preferred:
+        if candidate in supported:
+            return "cuda", candidate
+    return "cuda", "float32"
+
+def warmup_model(model, seconds=3, replicas=1):
+    """
+    Wykonuje krótką transkrypcję ciszy, aby zainicjalizować kernele i bufory modelu
+    
+    Args:
+        model (WhisperModel): Załadowany model
+        seconds (int): Długość próbnego nagrania w sekundach
+        replicas (int): Liczba kopii modelu (kart GPU) do rozgrzania
+    """
+    silence = np.zeros(seconds * SAMPLE_RATE, dtype=np.float32)
+    
+    def transcribe_silence(_):
+        segments, _ = model.transcribe(silence, language="pl", beam_size=1)
+        # Dekodowanie następuje dopiero podczas iteracji po segmentach
+        for _ in segments:
+            pass
+    
+    # Równoczesne wywołania trafiają do wolnych kopii modelu, więc każda karta dostaje swoje
+    with ThreadPoolExecutor(max_workers=replicas) as pool:
+        list(pool.map(transcribe_silence, range(replicas)))
+
+# Model Whisper oczekuje dźwięku mono 16 kHz
+SAMPLE_RATE = 16000
+
+# Nagrania dłuższe niż jedno okno modelu dzielone są na fragmenty dekodowane wsadowo
+CHUNK_SECONDS = 30
+MAX_BATCH_SIZE = 16
+
 # Użyj dostępnego modelu (sprawdź nazwę, którą masz zainstalowaną)
 model_name = "large-v3"  # Zmień na model, który masz dostępny lokalnie
+compute_type_override = None  # Np. "float16" (bez kwantyzacji int8) lub "float32"; None = automatycznie
+device, compute_type = detect_device(compute_type_override)
+# FlashAttention w CTranslate2 wymaga kart Ampere lub nowszych oraz ctranslate2 zbudowanego
+# z jego obsługą (oficjalne pakiety pip od wersji 4.4 jej nie zawierają), dlatego jest opcjonalny
+enable_flash_attention = False  # Ustaw True, jeśli Twoja instalacja ctranslate2 obsługuje FlashAttention
+use_flash_attention = (enable_flash_attention and device == "cuda"
+                       and torch.cuda.get_device_capability()[0] >= 8)
+# Przy kilku kartach model jest replikowany na każdą z nich (po jednej kopii na GPU)
+device_index = list(range(torch.cuda.device_count())) if device == "cuda" else [0]
 
-print(f"Ładowanie modelu Whisper: {model_name}")
-try:
-    model = whisper.load_model(model_name)
-    print(f"Model {model_name} załadowany pomyślnie!")
-except Exception as e:
-    print(f"Błąd podczas ładowania modelu: {str(e)}")
-    print("\nMożliwe przyczyny:")
-    print("1. Model nie został jeszcze w pełni pobrany")
-    print("2. Podano nieprawidłową nazwę modelu")
-    print("3. Model nie został poprawnie zainstalowany w katalogu cache whisper")
-    print("\nDostępne modele:")
-    cache_dir = os.path.expanduser("~/.cache/whisper/")
-    if os.path.exists(cache_dir):
-        models = [f.replace(".pt", "") for f in os.listdir(cache_dir) if f.endswith(".pt")]
-        for m in models:
-            print(f" - {m}")
+# Opcjonalnie: katalog z modelem wyeksportowanym do OpenVINO, np.
+# optimum-cli export openvino --model openai/whisper-large-v3 whisper-large-v3-ov
+openvino_model_dir = None  # Ustaw ścieżkę, aby na CPU/iGPU/NPU użyć OpenVINO
+openvino_device = "CPU"    # "CPU", "GPU" (zintegrowane) lub "NPU"
+OPENVINO_CACHE_DIR = "./ov_cache"  # Skompilowany model - kolejne uruchomienia startują szybciej
+use_openvino = WhisperPipeline is not None and openvino_model_dir is not None and device == "cpu"
+
+# Załadowane modele przechowywane na poziomie procesu, kluczem jest (model, urządzenie, typ obliczeń, karty GPU).
+# globals().get zachowuje cache przy ponownym uruchomieniu komórki notebooka,
+# więc wagi (~3 GB dla large-v3) nie są wczytywane z dysku drugi raz.
+MAX_CACHED_MODELS = 2
+_MODEL_CACHE = globals().get("_MODEL_CACHE", {})
+
+def load_model():
+    """
+    Ładuje model Whisper (faster-whisper lub OpenVINO)
+    
+    Returns:
+        WhisperModel | WhisperPipeline | None: Załadowany model lub None w przypadku błędu
+    """
+    if use_openvino:
+        cache_key = ("openvino", openvino_model_dir, openvino_device)
     else:
-        print("Brak katalogu cache dla modeli Whisper")
+        cache_key = (model_name, device, compute_type, tuple(device_index))
+    if cache_key in _MODEL_CACHE:
+        print(f"Model {model_name} pobrany z pamięci podręcznej ({', '.join(map(str, cache_key[1:]))})")
+        # Przesuń na koniec - najdawniej używany model jest zwalniany jako pierwszy
+        _MODEL_CACHE[cache_key] = _MODEL_CACHE.pop(cache_key)
+        return _MODEL_CACHE[cache_key]
+    
+    # Zwolnij najdawniej używany model przed ładowaniem nowego,
+    # aby w pamięci nie było naraz więcej niż MAX_CACHED_MODELS kopii wag
+    while len(_MODEL_CACHE) >= MAX_CACHED_MODELS:
+        _MODEL_CACHE.pop(next(iter(_MODEL_CACHE)))
+    gc.collect()
+    
+    try:
+        if use_openvino:
+            print(f"Ładowanie modelu Whisper (OpenVINO): {openvino_model_dir} ({openvino_device})")
+            model = WhisperPipeline(openvino_model_dir, openvino_device, CACHE_DIR=OPENVINO_CACHE_DIR)
+        else:
+            print(f"Ładowanie modelu Whisper: {model_name} ({device} {device_index}, {compute_type})")
+            model = WhisperModel(
+                model_name,
+                device=device,
+                device_index=device_index,
+                compute_type=compute_type,
+                flash_attention=use_flash_attention
+            )
+            # Na GPU rozgrzewka inicjalizuje kernele CUDA; na CPU tylko zabrałaby rdzenie wczytywaniu audio
+            if device == "cuda":
+                warmup_model(model, replicas=len(device_index))
+        print(f"Model {model_name} załadowany pomyślnie!")
+        _MODEL_CACHE[cache_key] = model
+        return model
+    except Exception as e:
+        print(f"Błąd podczas ładowania modelu: {str(e)}")
+        print("\nMożliwe przyczyny:")
+        print("1. Model nie został jeszcze w pełni pobrany")
+        print("2. Podano nieprawidłową nazwę modelu")
+        print("3. Model nie został poprawnie zainstalowany w katalogu cache Hugging Face")
+        print("\nDostępne modele:")
+        cache_dir = os.path.expanduser("~/.cache/huggingface/hub/")
+        if os.path.exists(cache_dir):
+            models = [f.split("--")[-1] for f in os.listdir(cache_dir) if "faster-whisper" in f]
+            for m in models:
+                print(f" - {m}")
+        else:
+            print("Brak katalogu cache dla modeli Whisper")
+        return None
+
+# Ładowanie modelu (odczyt ~3 GB wag) trwa w tle, równolegle z wczytywaniem audio.
+# Poprzedni wynik ładowania (przy ponownym uruchomieniu komórki) jest najpierw zwalniany,
+# aby nie przytrzymywał w pamięci modelu usuniętego z cache
+_model_loader = None
+_model_loader = ThreadPoolExecutor(max_workers=1).submit(load_model)
 
-# 2. Funkcja do transkrypcji audio używająca librosa zamiast FFmpeg
-# ----------------------------------------------------------------
-def transcribe_audio(audio_path, language="pl", translate=False):
+def get_model():
     """
-    Transkrybuje plik audio z użyciem modelu Whisper i biblioteki librosa
+    Zwraca model Whisper, czekając w razie potrzeby na zakończenie ładowania w tle
+    
+    Returns:
+        WhisperModel | WhisperPipeline | None: Załadowany model lub None w przypadku błędu
+    """
+    return _model_loader.result()
+
+# 2. Funkcja do transkrypcji audio używająca soundfile zamiast FFmpeg
+# ------------------------------------------------------------------
+def load_audio(audio_path, sr=SAMPLE_RATE):
+    """
+    Wczytuje plik audio jako mono float32 z podaną częstotliwością próbkowania
+    
+    Args:
+        audio_path (str): Ścieżka do pliku audio
+        sr (int): Docelowa częstotliwość próbkowania
+    
+    Returns:
+        np.ndarray: Próbki audio
+    """
+    try:
+        audio, native_sr = sf.read(audio_path, dtype="float32", always_2d=False)
+    except RuntimeError:
+        # Formaty nieobsługiwane przez libsndfile dekoduje PyAV dołączony do faster-whisper
+        return decode_audio(audio_path, sampling_rate=sr)
+    
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    
+    if native_sr != sr:
+        resample_device = "cuda" if torch.cuda.is_available() else "cpu"
+        audio = torchaudio.functional.resample(
+            torch.from_numpy(audio).to(resample_device), native_sr, sr
+        ).cpu().numpy()
+    
+    return audio
+
+def _segment_to_dict(segment):
+    """
+    Zamienia segment faster-whisper na słownik w formacie openai-whisper
+    
+    Args:
+        segment (Segment): Segment zwrócony przez model
+    
+    Returns:
+        dict: Segment w formacie oczekiwanym przez funkcje analizy
+    """
+    return {
+        "id": segment.id,
+        "seek": segment.seek,
+        "start": segment.start,
+        "end": segment.end,
+        "text": segment.text,
+        "tokens": list(segment.tokens),
+        "temperature": segment.temperature,
+        "avg_logprob": segment.avg_logprob,
+        "compression_ratio": segment.compression_ratio,
+        "no_speech_prob": segment.no_speech_prob
+    }
+
+def _transcribe_faster_whisper(model, audio, language, task, segments_file=None):
+    """
+    Transkrybuje próbki audio modelem faster-whisper
+    
+    Args:
+        model (WhisperModel): Załadowany model
+        audio (np.ndarray): Próbki audio mono 16 kHz
+        language (str): Kod języka
+        task (str): "transcribe" lub "translate"
+        segments_file (file): Plik binarny, do którego segmenty są dopisywane na bieżąco (NDJSON)
+    
+    Returns:
+        dict: Wynik transkrypcji w formacie openai-whisper
+    """
+    n_chunks = math.ceil(len(audio) / (CHUNK_SECONDS * SAMPLE_RATE))
+    if n_chunks > 1:
+        # Dłuższe nagrania: fragmenty ~30 s (cięte przez VAD w ciszy) dekodowane jednym wsadem
+        batch_size = min(n_chunks, MAX_BATCH_SIZE)
+        print(f"Transkrypcja wsadowa: ok. {n_chunks} fragmentów (dokładny podział ustala VAD), "
+              f"batch_size={batch_size}")
+        segments, info = BatchedInferencePipeline(model).transcribe(
+            audio,
+            language=language,
+            task=task,
+            beam_size=5,
+            batch_size=batch_size,
+            without_timestamps=False  # Segmenty na poziomie fraz, jak przy zwykłej transkrypcji
+        )
+    else:
+        segments, info = model.transcribe(
+            audio,
+            language=language,
+            task=task,
+            beam_size=5
+        )
+    
+    # Segmenty są generatorem - dekodowanie następuje podczas iteracji,
+    # więc każdy segment zapisujemy i opróżniamy bufor od razu
+    # (przerwanie, restart jądra lub awaria nie tracą gotowych wyników)
+    collected = []
+    # Postęp w sekundach nagrania, odświeżany najwyżej raz na sekundę
+    # (zamiast wypisywania każdego segmentu na stdout)
+    with tqdm(total=info.duration, unit="s", unit_scale=True, mininterval=1.0) as progress:
+        for segment in segments:
+            segment = _segment_to_dict(segment)
+            if segments_file is not None:
+                segments_file.write(orjson.dumps(segment, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n")
+                segments_file.flush()
+            collected.append(segment)
+            progress.update(max(0.0, segment["end"] - progress.n))
+        progress.update(max(0.0, progress.total - progress.n))
+    
+    return {
+        "text": "".join(segment["text"] for segment in collected),
+        "segments": collected,
+        "language": info.language
+    }
+
+def _transcribe_openvino(model, audio, language, task, segments_file=None):
+    """
+    Transkrybuje próbki audio potokiem OpenVINO GenAI
+    
+    Args:
+        model (WhisperPipeline): Załadowany potok
+        audio (np.ndarray): Próbki audio mono 16 kHz
+        language (str): Kod języka
+        task (str): "transcribe" lub "translate"
+        segments_file (file): Plik binarny, do którego segmenty są dopisywane na bieżąco (NDJSON)
+    
+    Returns:
+        dict: Wynik transkrypcji w formacie openai-whisper
+    """
+    output = model.generate(
+        audio.tolist(),
+        language=f"<|{language}|>",
+        task=task,
+        return_timestamps=True
+    )
+    
+    segments = []
+    for i, chunk in enumerate(output.chunks):
+        segment = {
+            "id": i,
+            "start": chunk.start_ts,
+            "end": chunk.end_ts,
+            "text": chunk.text
+        }
+        if segments_file is not None:
+            segments_file.write(orjson.dumps(segment, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n")
+            segments_file.flush()
+        segments.append(segment)
+    
+    return {
+        "text": output.texts[0],
+        "segments": segments,
+        "language": language
+    }
+
+def transcribe_audio(audio_path, language="pl", translate=False, segments_path=None):
+    """
+    Transkrybuje plik audio z użyciem modelu Whisper i biblioteki soundfile
     
     Args:
         audio_path (str): Ścieżka do pliku audio
         language (str): Kod języka (np. "pl" dla polskiego)
         translate (bool): Czy tłumaczyć na angielski
+        segments_path (str): Opcjonalny plik NDJSON zapisywany segment po segmencie w trakcie transkrypcji
     
     Returns:
         dict: Wynik transkrypcji
@@ -65,10 +366,11 @@ def transcribe_audio(audio_path, language="pl", translate=False):
     task = "translate" if translate else "transcribe"
     
     try:
-        # Wczytaj plik audio za pomocą librosa zamiast FFmpeg
-        print("Wczytywanie pliku audio za pomocą librosa...")
+        # Wczytaj plik audio za pomocą soundfile zamiast FFmpeg
+        print("Wczytywanie pliku audio za pomocą soundfile...")
         try:
-            audio, sr = librosa.load(audio_path, sr=16000, mono=True)
+            sr = SAMPLE_RATE
+            audio = load_audio(audio_path, sr=sr)
             print(f"Plik audio wczytany pomyślnie. Długość: {len(audio)/sr:.2f} sekund")
         except Exception as e:
             print(f"Błąd podczas wczytywania pliku audio: {str(e)}")
@@ -76,15 +378,19 @@ def transcribe_audio(audio_path, language="pl", translate=False):
             traceback.print_exc()
             return None
         
+        # Poczekaj na model ładowany w tle
+        model = get_model()
+        if model is None:
+            print("Błąd: Model Whisper nie został załadowany!")
+            return None
+        
         # Wykonaj transkrypcję
         print("Rozpoczynam proces transkrypcji...")
-        result = model.transcribe(
-            audio,
-            language=language,
-            task=task,
-            verbose=True,  # Wyświetlaj informacje o postępie
-            fp16=False     # Użyj precision FP32 (bardziej kompatybilne)
-        )
+        with open(segments_path, "wb") if segments_path else nullcontext() as segments_file:
+            if use_openvino:
+                result = _transcribe_openvino(model, audio, language, task, segments_file)
+            else:
+                result = _transcribe_faster_whisper(model, audio, language, task, segments_file)
         
         print("Transkrypcja zakończona pomyślnie!")
         return result
@@ -96,64 +402,147 @@ def transcribe_audio(audio_path, language="pl", translate=False):
 
 # 3. Funkcje do analizy transkrypcji
 # ---------------------------------
-def analyze_transcription(result):
+# Podstawowa analiza emocji (bardzo prosta - można rozbudować)
+POSITIVE_WORDS = frozenset(["dobrze", "świetnie", "super", "doskonale", "wspaniale", "tak", "lubię", "kocham"])
+NEGATIVE_WORDS = frozenset(["źle", "okropnie", "fatalnie", "niestety", "problem", "nie", "trudno", "ciężko"])
+
+# Wzorce kompilowane raz przy ładowaniu modułu
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+_WORD_RE = re.compile(r'\b\w+\b')
+
+# Analiza zapamiętywana jest tylko dla ostatnich transkrypcji - wystarcza przy ponownej
+# analizie lub wyszukiwaniu w tym samym tekście, a nie trzyma w pamięci całej serii plików
+TEXT_CACHE_SIZE = 2
+
+# Dla krótkich list słów kluczowych str.count (memchr/SIMD w C) jest szybszy niż
+# automat Aho-Corasick, którego pętla po dopasowaniach wykonuje się w Pythonie
+AHOCORASICK_MIN_KEYWORDS = 16
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def _lowercase(text):
     """
-    Przeprowadza podstawową analizę transkrypcji
+    Zwraca tekst małymi literami (zapamiętywany - wspólny dla analizy i wyszukiwania)
     
     Args:
-        result (dict): Wynik transkrypcji z Whisper
+        text (str): Tekst transkrypcji
     
     Returns:
-        dict: Statystyki analizy
+        str: Tekst małymi literami
     """
-    if result is None or "text" not in result:
-        print("Brak danych do analizy!")
-        return None
+    return text.lower()
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def _analyze_text(text):
+    """
+    Liczy statystyki zależne wyłącznie od tekstu (zapamiętywane dla tego samego tekstu)
     
-    text = result["text"]
+    Args:
+        text (str): Tekst transkrypcji
     
+    Returns:
+        dict: Statystyki tekstu
+    """
     # Podziel na zdania (naiwnie po kropkach, pytajnikach i wykrzyknikach)
-    sentences = re.split(r'[.!?]+', text)
-    sentences = [s.strip() for s in sentences if s.strip()]
+    sentences = [s for s in (s.strip() for s in _SENTENCE_SPLIT_RE.split(text)) if s]
     
     # Podziel na słowa
-    words = re.findall(r'\b\w+\b', text.lower())
+    words = _WORD_RE.findall(_lowercase(text))
     
     # Policz unikalne słowa
     unique_words = set(words)
     
-    # Analiza segmentów (jeśli dostępne)
-    segments_count = len(result.get("segments", []))
-    
-    # Podstawowa analiza emocji (bardzo prosta - można rozbudować)
-    positive_words = ["dobrze", "świetnie", "super", "doskonale", "wspaniale", "tak", "lubię", "kocham"]
-    negative_words = ["źle", "okropnie", "fatalnie", "niestety", "problem", "nie", "trudno", "ciężko"]
+    # Policz słowa nacechowane emocjonalnie w jednym przejściu
+    positive_count = negative_count = 0
+    for word in words:
+        if word in POSITIVE_WORDS:
+            positive_count += 1
+        elif word in NEGATIVE_WORDS:
+            negative_count += 1
     
-    positive_count = sum(1 for word in words if word in positive_words)
-    negative_count = sum(1 for word in words if word in negative_words)
-    
-    # Przygotuj wyniki analizy
-    analysis = {
+    return {
         "total_characters": len(text),
         "total_words": len(words),
         "unique_words": len(unique_words),
         "sentences_count": len(sentences),
-        "segments_count": segments_count,
         "average_words_per_sentence": len(words) / max(1, len(sentences)),
         "positive_words_count": positive_count,
         "negative_words_count": negative_count
     }
+
+def analyze_transcription(result):
+    """
+    Przeprowadza podstawową analizę transkrypcji
+    
+    Args:
+        result (dict): Wynik transkrypcji z Whisper
+    
+    Returns:
+        dict: Statystyki analizy
+    """
+    if result is None or "text" not in result:
+        print("Brak danych do analizy!")
+        return None
+    
+    # Kopia - wynik z cache nie może być modyfikowany przez wywołującego
+    analysis = dict(_analyze_text(result["text"]))
+    
+    # Analiza segmentów (jeśli dostępne)
+    analysis["segments_count"] = len(result.get("segments", []))
     
     return analysis
 
-def display_transcription_analysis(result, analysis):
+def plots_enabled():
+    """
+    Sprawdza, czy rysować wykresy (wyłączone przez WHISPER_NO_PLOT=1 lub nieinteraktywny
+    backend matplotlib, np. MPLBACKEND=Agg, pdf, svg)
+    
+    Returns:
+        bool: True, jeśli wykresy mogą zostać wyświetlone
+    """
+    if os.environ.get("WHISPER_NO_PLOT") == "1":
+        return False
+    
+    try:
+        # matplotlib >= 3.9
+        from matplotlib.backends import BackendFilter, backend_registry
+        non_interactive = backend_registry.list_builtin(BackendFilter.NON_INTERACTIVE)
+    except ImportError:
+        non_interactive = matplotlib.rcsetup.non_interactive_bk
+    return matplotlib.get_backend().lower() not in non_interactive
+
+def _format_seconds(seconds):
+    """
+    Formatuje kolumnę sekund jak str(timedelta), np. "0:01:15" lub "0:00:01.300000"
+    
+    Args:
+        seconds (pd.Series): Czas w sekundach
+    
+    Returns:
+        pd.Series: Sformatowany czas
+    """
+    parts = pd.to_timedelta(seconds.round(1), unit='s').dt.components
+    hours = parts['days'] * 24 + parts['hours']
+    formatted = (hours.astype(str)
+                 + ':' + parts['minutes'].astype(str).str.zfill(2)
+                 + ':' + parts['seconds'].astype(str).str.zfill(2))
+    
+    # Część ułamkowa tylko wtedy, gdy jest niezerowa (jak w str(timedelta))
+    microseconds = parts['milliseconds'] * 1000 + parts['microseconds']
+    fraction = '.' + microseconds.astype(str).str.zfill(6)
+    return formatted.where(microseconds == 0, formatted + fraction)
+
+def display_transcription_analysis(result, analysis, interactive=None):
     """
     Wyświetla analizę transkrypcji
     
     Args:
         result (dict): Wynik transkrypcji z Whisper
         analysis (dict): Wynik analizy transkrypcji
+        interactive (bool): Czy rysować wykresy (domyślnie wg plots_enabled())
     """
+    if interactive is None:
+        interactive = plots_enabled()
+    
     if result is None or analysis is None:
         print("Brak danych do wyświetlenia!")
         return
@@ -180,64 +569,117 @@ def display_transcription_analysis(result, analysis):
         print(f"Słowa negatywne: {analysis['negative_words_count']}")
         
         # Wykres słupkowy
-        plt.figure(figsize=(10, 5))
-        plt.bar(['Pozytywne', 'Negatywne'], 
-                [analysis['positive_words_count'], analysis['negative_words_count']], 
-                color=['green', 'red'])
-        plt.title('Analiza tonacji')
-        plt.ylabel('Liczba słów')
-        plt.show()
+        if interactive:
+            fig = plt.figure(figsize=(10, 5))
+            plt.bar(['Pozytywne', 'Negatywne'], 
+                    [analysis['positive_words_count'], analysis['negative_words_count']], 
+                    color=['green', 'red'])
+            plt.title('Analiza tonacji')
+            plt.ylabel('Liczba słów')
+            plt.show()
+            plt.close(fig)
     
     # Wyświetl segmenty (przedziały czasowe)
     if 'segments' in result and len(result['segments']) > 0:
         print("\nSEGMENTY TRANSKRYPCJI:")
-        segments_df = pd.DataFrame([
-            {
-                'start': segment['start'],
-                'end': segment['end'],
-                'duration': segment['end'] - segment['start'],
-                'text': segment['text']
-            }
-            for segment in result['segments']
-        ])
+        segments_df = pd.DataFrame.from_records(
+            ((segment['start'], segment['end'], segment['end'] - segment['start'], segment['text'])
+             for segment in result['segments']),
+            columns=['start', 'end', 'duration', 'text']
+        )
         
         # Formatuj czas jako czas trwania
-        segments_df['start_time'] = segments_df['start'].apply(lambda x: str(timedelta(seconds=round(x, 1))))
-        segments_df['end_time'] = segments_df['end'].apply(lambda x: str(timedelta(seconds=round(x, 1))))
+        for column in ['start', 'end']:
+            segments_df[f'{column}_time'] = _format_seconds(segments_df[column])
         
         # Wyświetl tabelę segmentów
         display(segments_df[['start_time', 'end_time', 'duration', 'text']])
         
         # Wykres długości segmentów
-        plt.figure(figsize=(12, 6))
-        plt.bar(range(len(segments_df)), segments_df['duration'], color='blue', alpha=0.7)
-        plt.xlabel('Numer segmentu')
-        plt.ylabel('Czas trwania (s)')
-        plt.title('Długość segmentów transkrypcji')
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        plt.show()
+        if interactive:
+            fig = plt.figure(figsize=(12, 6))
+            plt.bar(range(len(segments_df)), segments_df['duration'], color='blue', alpha=0.7)
+            plt.xlabel('Numer segmentu')
+            plt.ylabel('Czas trwania (s)')
+            plt.title('Długość segmentów transkrypcji')
+            plt.grid(axis='y', linestyle='--', alpha=0.7)
+            plt.show()
+            plt.close(fig)
+
+def _count_keywords_ahocorasick(text, keywords):
+    """
+    Zlicza wystąpienia wszystkich słów kluczowych w jednym przejściu automatem Aho-Corasick
+    
+    Args:
+        text (str): Tekst do przeszukania
+        keywords (set): Słowa kluczowe (już sprowadzone do małych liter)
+    
+    Returns:
+        dict: Liczba wystąpień dla każdego słowa kluczowego
+    """
+    # Import na żądanie - pyahocorasick potrzebny jest tylko dla długich list słów kluczowych
+    import ahocorasick
+    
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        if keyword:
+            automaton.add_word(keyword, keyword)
+    
+    counts = dict.fromkeys(keywords, 0)
+    if len(automaton) == 0:
+        return counts
+    automaton.make_automaton()
+    
+    # Dla każdego słowa liczymy wystąpienia nienakładające się (jak str.count)
+    last_end = {}
+    for end, keyword in automaton.iter(text):
+        if end - len(keyword) >= last_end.get(keyword, -1):
+            counts[keyword] += 1
+            last_end[keyword] = end
+    
+    return counts
 
-def search_keywords(result, keywords):
+def _count_keywords(text, keywords):
+    """
+    Zlicza wystąpienia słów kluczowych (dla dłuższych list automatem Aho-Corasick)
+    
+    Args:
+        text (str): Tekst do przeszukania
+        keywords (set): Słowa kluczowe (już sprowadzone do małych liter)
+    
+    Returns:
+        dict: Liczba wystąpień dla każdego słowa kluczowego
+    """
+    if len(keywords) >= AHOCORASICK_MIN_KEYWORDS:
+        try:
+            return _count_keywords_ahocorasick(text, keywords)
+        except ImportError:
+            print("Brak pakietu pyahocorasick - słowa kluczowe liczone po kolei")
+    
+    return {keyword: text.count(keyword) if keyword else 0 for keyword in keywords}
+
+def search_keywords(result, keywords, interactive=None):
     """
     Wyszukuje słowa kluczowe w transkrypcji
     
     Args:
         result (dict): Wynik transkrypcji z Whisper
         keywords (list): Lista słów kluczowych do wyszukania
+        interactive (bool): Czy rysować wykres (domyślnie wg plots_enabled())
     
     Returns:
         dict: Wyniki wyszukiwania
     """
+    if interactive is None:
+        interactive = plots_enabled()
+    
     if result is None or "text" not in result:
         print("Brak danych do wyszukiwania!")
         return None
     
-    text = result["text"].lower()
-    results = {}
-    
-    for keyword in keywords:
-        count = text.count(keyword.lower())
-        results[keyword] = count
+    text = _lowercase(result["text"])
+    counts = _count_keywords(text, {keyword.lower() for keyword in keywords})
+    results = {keyword: counts.get(keyword.lower(), 0) for keyword in keywords}
     
     # Wyświetl wyniki
     print("\nWYSZUKIWANIE SŁÓW KLUCZOWYCH:")
@@ -246,68 +688,195 @@ def search_keywords(result, keywords):
         print(f"{status} {keyword}: {count} wystąpień")
     
     # Wykres słupkowy
-    plt.figure(figsize=(12, 6))
-    plt.bar(results.keys(), results.values(), color='purple', alpha=0.7)
-    plt.xlabel('Słowo kluczowe')
-    plt.ylabel('Liczba wystąpień')
-    plt.title('Występowanie słów kluczowych')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+    if interactive:
+        fig = plt.figure(figsize=(12, 6))
+        plt.bar(results.keys(), results.values(), color='purple', alpha=0.7)
+        plt.xlabel('Słowo kluczowe')
+        plt.ylabel('Liczba wystąpień')
+        plt.title('Występowanie słów kluczowych')
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        plt.show()
+        plt.close(fig)
     
     return results
 
-# 4. Wykonanie transkrypcji na przykładzie
-# --------------------------------------
-# Poniżej wpisz ścieżkę do swojego pliku audio
-audio_path = "przykład.mp3"  # ZMIEŃ NA WŁAŚCIWĄ ŚCIEŻKĘ!
+# 4. Przetwarzanie wielu plików jednym załadowanym modelem
+# -------------------------------------------------------
+def _output_base(audio_path, output_dir):
+    """
+    Zwraca wspólny przedrostek ścieżek plików wynikowych dla pliku audio
+    
+    Args:
+        audio_path (str): Ścieżka do pliku audio
+        output_dir (str): Katalog na pliki wynikowe
+    
+    Returns:
+        str: Przedrostek ścieżek, np. "wyniki/nagranie_mp3"
+    """
+    # Rozszerzenie zostaje w nazwie, aby np. nagranie.mp3 i nagranie.wav nie nadpisywały swoich wyników
+    stem, ext = os.path.splitext(os.path.basename(audio_path))
+    return os.path.join(output_dir, f"{stem}_{ext.lstrip('.')}" if ext else stem)
 
-# Próba odtworzenia pliku audio (opcjonalnie)
-try:
-    print("\nPodgląd pliku audio:")
-    display(Audio(audio_path))
-except Exception as e:
-    print(f"Nie można odtworzyć pliku w notebooku: {str(e)}")
-    print("To normalne - można kontynuować transkrypcję.")
-
-# Sprawdzenie, czy plik istnieje
-if os.path.exists(audio_path):
-    file_size_mb = os.path.getsize(audio_path)/1024/1024
-    print(f"Plik istnieje i ma rozmiar: {file_size_mb:.2f} MB")
-else:
-    print(f"UWAGA: Plik nie istnieje! Sprawdź ścieżkę.")
-
-# Wykonaj transkrypcję
-result = transcribe_audio(audio_path, language="pl")
-
-# Jeśli transkrypcja się powiodła, przeprowadź analizę
-if result:
+def transcribe_file(audio_path, output_dir="wyniki"):
+    """
+    Transkrybuje jeden plik audio, zapisując segmenty na bieżąco do pliku NDJSON
+    
+    Args:
+        audio_path (str): Ścieżka do pliku audio
+        output_dir (str): Katalog na pliki wynikowe
+    
+    Returns:
+        dict: Wynik transkrypcji lub None w przypadku błędu
+    """
+    # Sprawdzenie, czy plik istnieje
+    if os.path.exists(audio_path):
+        file_size_mb = os.path.getsize(audio_path)/1024/1024
+        print(f"Plik {os.path.basename(audio_path)} istnieje i ma rozmiar: {file_size_mb:.2f} MB")
+    else:
+        print(f"UWAGA: Plik {audio_path} nie istnieje! Sprawdź ścieżkę.")
+    
+    # Przygotuj katalog na wyniki
+    os.makedirs(output_dir, exist_ok=True)
+    
+    output_base = _output_base(audio_path, output_dir)
+    return transcribe_audio(audio_path, language="pl", segments_path=f"{output_base}_segmenty.ndjson")
+
+def report_file(audio_path, result, keywords, output_dir="wyniki", interactive=None):
+    """
+    Analizuje, wyświetla i zapisuje wyniki transkrypcji jednego pliku audio
+    
+    Args:
+        audio_path (str): Ścieżka do pliku audio
+        result (dict): Wynik transkrypcji (None, jeśli się nie powiodła)
+        keywords (list): Lista słów kluczowych do wyszukania
+        output_dir (str): Katalog na pliki wynikowe
+        interactive (bool): Czy rysować wykresy (domyślnie wg plots_enabled())
+    
+    Returns:
+        dict: Wynik transkrypcji lub None w przypadku błędu
+    """
+    # Próba odtworzenia pliku audio (opcjonalnie)
+    try:
+        print("\nPodgląd pliku audio:")
+        display(Audio(audio_path))
+    except Exception as e:
+        print(f"Nie można odtworzyć pliku w notebooku: {str(e)}")
+        print("To normalne - można kontynuować transkrypcję.")
+    
+    # Jeśli transkrypcja się nie powiodła, przejdź do kolejnego pliku
+    if not result:
+        print("Nie udało się wykonać transkrypcji. Sprawdź powyższe błędy.")
+        return None
+    
+    output_base = _output_base(audio_path, output_dir)
+    
     # Przeprowadź podstawową analizę
     analysis = analyze_transcription(result)
     
     # Wyświetl wyniki
-    display_transcription_analysis(result, analysis)
-    
-    # Wyszukaj słowa kluczowe (dostosuj do swoich potrzeb)
-    keywords = ["przykład", "test", "ważne", "proszę", "dziękuję"]
-    search_results = search_keywords(result, keywords)
+    display_transcription_analysis(result, analysis, interactive)
     
-    # Zapisz wyniki do pliku (opcjonalnie)
-    output_dir = "wyniki"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    # Wyszukaj słowa kluczowe
+    search_keywords(result, keywords, interactive)
     
-    output_base = os.path.join(output_dir, os.path.splitext(os.path.basename(audio_path))[0])
-    
-    # Zapisz transkrypcję jako tekst
-    with open(f"{output_base}_transkrypcja.txt", "w", encoding="utf-8") as f:
-        f.write(result["text"])
+    # Zapisz transkrypcję jako tekst (kodowanie UTF-8 wykonywane raz)
+    with open(f"{output_base}_transkrypcja.txt", "wb") as f:
+        f.write(result["text"].encode("utf-8"))
     
     # Zapisz pełny wynik jako JSON
-    with open(f"{output_base}_pełny_wynik.json", "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    with open(f"{output_base}_pełny_wynik.json", "wb") as f:
+        f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     
     print(f"\nTranskrypcja zapisana do: {output_base}_transkrypcja.txt")
     print(f"Pełny wynik zapisany do: {output_base}_pełny_wynik.json")
-else:
-    print("Nie udało się wykonać transkrypcji. Sprawdź powyższe błędy.")
+    print(f"Segmenty zapisane do: {output_base}_segmenty.ndjson")
+    
+    return result
+
+def process_file(audio_path, keywords, output_dir="wyniki", interactive=None):
+    """
+    Transkrybuje, analizuje i zapisuje wyniki dla jednego pliku audio
+    
+    Args:
+        audio_path (str): Ścieżka do pliku audio
+        keywords (list): Lista słów kluczowych do wyszukania
+        output_dir (str): Katalog na pliki wynikowe
+        interactive (bool): Czy rysować wykresy (domyślnie wg plots_enabled())
+    
+    Returns:
+        dict: Wynik transkrypcji lub None w przypadku błędu
+    """
+    result = transcribe_file(audio_path, output_dir)
+    return report_file(audio_path, result, keywords, output_dir, interactive)
+
+def _print_file_header(i, total, audio_path):
+    """
+    Wyświetla nagłówek oddzielający wyniki kolejnych plików
+    
+    Args:
+        i (int): Numer pliku (od 1)
+        total (int): Liczba wszystkich plików
+        audio_path (str): Ścieżka do pliku audio
+    """
+    print("\n" + "#" * 80)
+    print(f"PLIK {i}/{total}: {audio_path}")
+    print("#" * 80)
+
+def run(audio_paths, keywords, output_dir="wyniki", interactive=None):
+    """
+    Przetwarza listę plików audio, używając jednego załadowanego modelu
+    
+    Przy kilku kartach GPU wszystkie pliki są najpierw transkrybowane równolegle
+    (jeden wątek na kartę), a następnie wyniki wyświetlane i zapisywane w kolejności
+    podanych ścieżek.
+    
+    Args:
+        audio_paths (list): Ścieżki do plików audio
+        keywords (list): Lista słów kluczowych do wyszukania
+        output_dir (str): Katalog na pliki wynikowe
+        interactive (bool): Czy rysować wykresy (domyślnie wg plots_enabled())
+    
+    Returns:
+        dict: Wyniki transkrypcji dla każdej ścieżki (None dla nieudanych)
+    """
+    # Pliki o tej samej nazwie z różnych katalogów zapisałyby wyniki w to samo miejsce
+    output_bases = [_output_base(audio_path, output_dir) for audio_path in audio_paths]
+    duplicates = sorted({base for base in output_bases if output_bases.count(base) > 1})
+    for base in duplicates:
+        print(f"UWAGA: Kilka plików zapisze wyniki do {base}_* - zostanie tylko wynik ostatniego!")
+    
+    workers = min(len(device_index), len(audio_paths)) if not use_openvino else 1
+    results = {}
+    
+    if workers <= 1:
+        # Jedno urządzenie: pliki przetwarzane ściśle po kolei
+        for i, audio_path in enumerate(audio_paths, 1):
+            _print_file_header(i, len(audio_paths), audio_path)
+            # Wyniki każdego pliku zapisywane są od razu, przed przejściem do następnego
+            results[audio_path] = process_file(audio_path, keywords, output_dir, interactive)
+    else:
+        # Najpierw wszystkie transkrypcje (równolegle), dopiero potem raporty - komunikaty
+        # i paski postępu wątków nie przeplatają się z wyświetlanymi wynikami
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            transcriptions = list(pool.map(transcribe_file, audio_paths, [output_dir] * len(audio_paths)))
+        
+        for i, (audio_path, result) in enumerate(zip(audio_paths, transcriptions), 1):
+            _print_file_header(i, len(audio_paths), audio_path)
+            results[audio_path] = report_file(audio_path, result, keywords, output_dir, interactive)
+    
+    succeeded = sum(1 for result in results.values() if result)
+    print(f"\nPrzetworzono pomyślnie {succeeded} z {len(audio_paths)} plików.")
+    return results
+
+# 5. Wykonanie transkrypcji na przykładzie
+# --------------------------------------
+# Poniżej wpisz ścieżkę do swojego pliku audio lub wzorzec, np. "nagrania/*.mp3"
+audio_pattern = "przykład.mp3"  # ZMIEŃ NA WŁAŚCIWĄ ŚCIEŻKĘ!
+
+# Słowa kluczowe do wyszukania (dostosuj do swoich potrzeb)
+keywords = ["przykład", "test", "ważne", "proszę", "dziękuję"]
+
+# Jeśli wzorzec nic nie dopasował, przekaż go dalej - transcribe_file zgłosi brak pliku
+audio_paths = sorted(glob.glob(audio_pattern)) or [audio_pattern]
+results = run(audio_paths, keywords)